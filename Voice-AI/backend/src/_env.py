@@ -0,0 +1,12 @@
+import functools
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+_ENV_PATH = Path(__file__).resolve().parent.parent / ".env.local"
+
+
+@functools.lru_cache(maxsize=1)
+def ensure_loaded() -> None:
+    """Load `.env.local` into the environment once per process."""
+    load_dotenv(_ENV_PATH)
@@ -0,0 +1,179 @@
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+from collections import deque
+
+from livekit import rtc
+from livekit.agents import (
+    AgentSession,
+    MetricsCollectedEvent,
+    WorkerOptions,
+    cli,
+    metrics,
+    room_io,
+    tokenize,
+)
+
+from _env import ensure_loaded
+
+ensure_loaded()
+
+logger = logging.getLogger("pipeline")
+
+METRICS_FLUSH_INTERVAL = 0.5  # seconds between batched metrics flushes
+
+
+def _nc_enabled(raw: str) -> bool:
+    return raw.strip().lower() not in {"0", "false", "no", "off"}
+
+
+# Set ENABLE_NC=0 (or false/no/off) to skip noise cancellation, e.g. to A/B its
+# CPU cost or when self-hosting LiveKit, where the Cloud noise cancellation
+# models are unavailable.
+ENABLE_NC = _nc_enabled(os.getenv("ENABLE_NC", "1"))
+
+
+@functools.lru_cache(maxsize=1)
+def load_vad():
+    # Cached per interpreter so thread-based job executors (the default on
+    # Windows) share one model instead of loading a copy per job.
+    from livekit.plugins import silero
+
+    return silero.VAD.load()
+
+
+def create_session(vad, prompt_cache_key):
+    # Plugins pull in onnxruntime and the provider SDKs, so they are only
+    # imported once a job actually needs them.
+    from livekit.plugins import deepgram, murf, openai
+
+    return AgentSession(
+        # Flux does end-of-turn detection inside the STT model; EagerEndOfTurn
+        # events are surfaced as preflight transcripts so preemptive generation
+        # can start the LLM before the turn is confirmed.
+        stt=deepgram.STTv2(
+            model="flux-general-en",
+            eager_eot_threshold=0.4,
+        ),
+        llm=openai.LLM(
+            model="gpt-4o-mini",
+            temperature=0.7,
+            # Each agent's instructions are a module constant, so they form a
+            # stable prefix; the key routes every session to that cached prefix.
+            prompt_cache_key=prompt_cache_key,
+        ),
+        tts=murf.TTS(
+            voice="en-US-matthew",
+            style="Conversation",
+            tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
+            text_pacing=True,
+        ),
+        turn_detection="stt",
+        vad=vad,
+        preemptive_generation=True,
+    )
+
+
+def drain_metrics(buffer, collector):
+    while buffer:
+        agent_metrics = buffer.popleft()
+        # One bad item must not stop the flusher or lose the rest of the batch.
+        try:
+            metrics.log_metrics(agent_metrics)
+            collector.collect(agent_metrics)
+        except Exception:
+            logger.exception("Failed to process %s", type(agent_metrics).__name__)
+
+
+async def flush_metrics(buffer, collector):
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+        drain_metrics(buffer, collector)
+
+
+async def stop_metrics_flush(flush_task, buffer, collector):
+    """Stop the flusher and drain what it has not picked up yet."""
+    flush_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await flush_task
+    drain_metrics(buffer, collector)
+
+
+def attach_metrics(ctx, session, logger):
+    """Collect the session's metrics and log the usage summary at shutdown."""
+    usage_collector = metrics.UsageCollector()
+    # The event handler only queues; logging and aggregation run in batches
+    # off the per-event path.
+    metrics_buffer = deque()
+    flush_task = asyncio.create_task(flush_metrics(metrics_buffer, usage_collector))
+
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev: MetricsCollectedEvent):
+        metrics_buffer.append(ev.metrics)
+
+    async def log_usage():
+        await stop_metrics_flush(flush_task, metrics_buffer, usage_collector)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Usage: %s", usage_collector.get_summary())
+
+    # Kept as a closure: add_shutdown_callback inspects __code__ to decide how
+    # to call it, which a functools.partial does not have.
+    ctx.add_shutdown_callback(log_usage)
+
+
+def prewarm(proc):
+    # Job processes create their event loop after prewarm returns
+    install_uvloop()
+    # Load VAD model once for all workers
+    proc.userdata["vad"] = load_vad()
+
+
+async def offload_write(write, *args):
+    # Keep disk writes off the event loop that also drives STT/TTS.
+    await asyncio.to_thread(write, *args)
+
+
+def select_noise_cancellation(params):
+    import livekit.plugins.noise_cancellation as noise_cancellation
+
+    # SIP callers arrive as narrowband audio, which the telephony model is
+    # tuned for; everyone else gets full BVC.
+    if params.participant.kind == rtc.ParticipantKind.PARTICIPANT_KIND_SIP:
+        return noise_cancellation.BVCTelephony()
+    return noise_cancellation.BVC()
+
+
+def install_uvloop():
+    # libuv-backed event loop for the websocket-heavy STT/LLM/TTS pipeline.
+    # uvloop has no Windows build; the default loop is kept there.
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+def room_options():
+    return room_io.RoomOptions(
+        audio_input=room_io.AudioInputOptions(
+            noise_cancellation=select_noise_cancellation if ENABLE_NC else None,
+        ),
+    )
+
+
+def run_app(entrypoint):
+    # Plugins register on import and must do so on the main thread; importing
+    # them here also lets `download-files` and the forkserver preload see them.
+    from livekit.plugins import (  # noqa: F401
+        deepgram,
+        murf,
+        noise_cancellation,
+        openai,
+        silero,
+    )
+
+    install_uvloop()
+
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -1,29 +1,25 @@
 import logging
-import json
 import os
 
-from dotenv import load_dotenv
+import orjson
 from livekit.agents import (
     Agent,
-    AgentSession,
     JobContext,
-    JobProcess,
-    MetricsCollectedEvent,
-    RoomInputOptions,
-    WorkerOptions,
-    cli,
-    metrics,
-    tokenize,
     function_tool,
     RunContext,
 )
-from livekit.plugins import murf, silero, deepgram, openai
-import livekit.plugins.noise_cancellation as noise_cancellation
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
+
+from _env import ensure_loaded
+from _pipeline import (
+    attach_metrics,
+    create_session,
+    offload_write,
+    room_options,
+    run_app,
+)
 
 # Load environment variables
-env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env.local")
-load_dotenv(env_path)
+ensure_loaded()
 
 logger = logging.getLogger("agent")
 
@@ -33,16 +29,13 @@ dummy_detected = False
 for var in required_vars:
     if var not in os.environ or os.environ.get(var, "").startswith("dummy_"):
         dummy_detected = True
-        logger.error(f"Environment variable {var} is missing or set to dummy value.")
+        logger.error("Environment variable %s is missing or set to dummy value.", var)
 if dummy_detected:
     logger.error("LIVEKIT environment variables are not properly configured. Please set LIVEKIT_URL, LIVEKIT_API_KEY, and LIVEKIT_API_SECRET in your .env.local or environment.")
     import sys
     sys.exit(1)
 
-class Assistant(Agent):
-    def __init__(self) -> None:
-        super().__init__(
-            instructions="""You are a friendly barista at CodeBrew Coffee.
+BARISTA_INSTRUCTIONS = """You are a friendly barista at CodeBrew Coffee.
 Your goal is to take the customer's order efficiently and warmly.
 You need to collect the following information to complete an order:
 - Drink Type (e.g., Latte, Cappuccino, Americano, Espresso)
@@ -51,15 +44,27 @@ You need to collect the following information to complete an order:
 - Extras (e.g., Vanilla Syrup, Extra Shot, Whipped Cream, None)
 - Customer Name
 
-Current Order State is available to you. Ask clarifying questions to fill in any missing details (null values).
-If the user specifies multiple things at once, update them all.
-For 'extras', if the user adds something, append it to the list.
+Record each detail with its own tool: 'set_drink', 'set_size', 'set_milk', 'set_name', and 'add_extras'.
+Every tool returns the Current Order State. Ask clarifying questions to fill in any missing details (null values).
+If the user specifies multiple things at once, call the tool for each of them.
+For 'extras', if the user adds something, pass it to 'add_extras'; it is appended to the list.
 Once you have all the details (Drink Type, Size, Milk, Name), recite the full order back to the customer for confirmation.
 If they confirm, use the 'finalize_order' tool to save the order.
-If they want to change something, use 'update_order'.
+If they want to change something, call the tool for that detail again.
 
 Be conversational, friendly, and helpful.
-""",
+"""
+
+
+def _write_order(data):
+    with open("order.json", "wb") as f:
+        f.write(data)
+
+
+class Assistant(Agent):
+    def __init__(self) -> None:
+        super().__init__(
+            instructions=BARISTA_INSTRUCTIONS,
         )
         self.order_state = {
             "drinkType": None,
@@ -68,90 +73,80 @@ Be conversational, friendly, and helpful.
             "extras": [],
             "name": None,
         }
+        # Side index of order_state["extras"] for O(1) duplicate checks.
+        self._extras_set: set[str] = set()
+        # Serialized order_state, rebuilt only when a tool actually changes it.
+        self._order_json_cache = orjson.dumps(self.order_state).decode()
+
+    def _order_updated(self, dirty: bool) -> str:
+        if dirty:
+            self._order_json_cache = orjson.dumps(self.order_state).decode()
+        return f"Order updated. Current state: {self._order_json_cache}"
+
+    def _set_field(self, key: str, value: str) -> str:
+        # A blank answer means the detail is still missing, not an empty choice.
+        value = value.strip() or None
+        dirty = self.order_state[key] != value
+        self.order_state[key] = value
+        return self._order_updated(dirty)
 
     @function_tool
-    async def update_order(
-        self,
-        ctx: RunContext,
-        drinkType: str = None,
-        size: str = None,
-        milk: str = None,
-        extras: str = None,
-        name: str = None,
-    ):
-        """Update the order details based on user input."""
-        if drinkType:
-            self.order_state["drinkType"] = drinkType
-        if size:
-            self.order_state["size"] = size
-        if milk:
-            self.order_state["milk"] = milk
-        if name:
-            self.order_state["name"] = name
-        if extras:
-            new_extras = [e.strip() for e in extras.split(',') if e.strip()]
-            for extra in new_extras:
-                if extra not in self.order_state["extras"]:
-                    self.order_state["extras"].append(extra)
-        return f"Order updated. Current state: {json.dumps(self.order_state)}"
+    async def set_drink(self, ctx: RunContext, drinkType: str):
+        """Set the drink type, e.g. Latte, Cappuccino, Americano or Espresso."""
+        return self._set_field("drinkType", drinkType)
+
+    @function_tool
+    async def set_size(self, ctx: RunContext, size: str):
+        """Set the drink size: Small, Medium or Large."""
+        return self._set_field("size", size)
+
+    @function_tool
+    async def set_milk(self, ctx: RunContext, milk: str):
+        """Set the milk type: Whole, Skim, Oat, Almond, Soy or None."""
+        return self._set_field("milk", milk)
+
+    @function_tool
+    async def set_name(self, ctx: RunContext, name: str):
+        """Set the customer's name for the order."""
+        return self._set_field("name", name)
+
+    @function_tool
+    async def add_extras(self, ctx: RunContext, extras: str):
+        """Add comma-separated extras, e.g. Vanilla Syrup, Extra Shot, Whipped Cream."""
+        new_extras = [e.strip() for e in extras.split(',') if e.strip()]
+        dirty = False
+        for extra in new_extras:
+            if extra not in self._extras_set:
+                self._extras_set.add(extra)
+                self.order_state["extras"].append(extra)
+                dirty = True
+        return self._order_updated(dirty)
 
     @function_tool
     async def finalize_order(self, ctx: RunContext):
         """Finalize and save the order after confirmation."""
-        with open("order.json", "w") as f:
-            json.dump(self.order_state, f, indent=2)
+        data = orjson.dumps(self.order_state, option=orjson.OPT_INDENT_2)
+        await offload_write(_write_order, data)
         return "Order finalized and saved to order.json."
 
-def prewarm(proc: JobProcess):
-    # Load VAD model once for all workers
-    proc.userdata["vad"] = silero.VAD.load()
-
 async def entrypoint(ctx: JobContext):
     # Add room name to log context for easier debugging
     ctx.log_context_fields = {"room": ctx.room.name}
 
-    session = AgentSession(
-        stt=deepgram.STT(model="nova-3"),
-        llm=openai.LLM(
-            model="gpt-4o-mini",
-            temperature=0.7,
-        ),
-        tts=murf.TTS(
-            voice="en-US-matthew",
-            style="Conversation",
-            tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-            text_pacing=True,
-        ),
-        turn_detection=MultilingualModel(),
-        vad=ctx.proc.userdata["vad"],
-        preemptive_generation=True,
-    )
+    session = create_session(ctx.proc.userdata["vad"], "codebrew-barista")
 
     # Metrics collection
-    usage_collector = metrics.UsageCollector()
-
-    @session.on("metrics_collected")
-    def _on_metrics_collected(ev: MetricsCollectedEvent):
-        metrics.log_metrics(ev.metrics)
-        usage_collector.collect(ev.metrics)
-
-    async def log_usage():
-        summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
-
-    ctx.add_shutdown_callback(log_usage)
+    attach_metrics(ctx, session, logger)
 
     # Start the session with the Assistant agent
     await session.start(
         agent=Assistant(),
         room=ctx.room,
-        room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVC(),
-        ),
+        room_options=room_options(),
     )
 
     # Connect to the room and begin interaction
     await ctx.connect()
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+    run_app(entrypoint)
@@ -1,34 +1,34 @@
 import logging
-import json
 import os
-from datetime import datetime
+import time
+from collections import deque
+from datetime import datetime, timezone
 
-from dotenv import load_dotenv
+import orjson
 from livekit.agents import (
     Agent,
-    AgentSession,
     JobContext,
-    JobProcess,
-    MetricsCollectedEvent,
-    RoomInputOptions,
-    WorkerOptions,
-    cli,
-    metrics,
-    tokenize,
     function_tool,
     RunContext,
 )
-from livekit.plugins import murf, silero, deepgram, openai
-import livekit.plugins.noise_cancellation as noise_cancellation
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
+
+from _env import ensure_loaded
+from _pipeline import (
+    attach_metrics,
+    create_session,
+    offload_write,
+    room_options,
+    run_app,
+)
 
 # Load environment variables
-env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env.local")
-load_dotenv(env_path)
+ensure_loaded()
 
 logger = logging.getLogger("wellness_agent")
 
-WELLNESS_LOG_PATH = os.path.join(os.path.dirname(__file__), "wellness_log.json")
+WELLNESS_LOG_PATH = os.path.join(os.path.dirname(__file__), "wellness_log.jsonl")
+# Pre-JSONL log: one JSON array, converted into WELLNESS_LOG_PATH on first use.
+LEGACY_WELLNESS_LOG_PATH = os.path.join(os.path.dirname(__file__), "wellness_log.json")
 
 # Ensure required LiveKit environment variables are set; provide defaults for development.
 required_vars = ["LIVEKIT_URL", "LIVEKIT_API_KEY", "LIVEKIT_API_SECRET"]
@@ -36,36 +36,14 @@ dummy_detected = False
 for var in required_vars:
     if var not in os.environ or os.environ.get(var, "").startswith("dummy_"):
         dummy_detected = True
-        logger.error(f"Environment variable {var} is missing or set to dummy value.")
+        logger.error("Environment variable %s is missing or set to dummy value.", var)
 if dummy_detected:
     logger.error("LIVEKIT environment variables are not properly configured. Please set LIVEKIT_URL, LIVEKIT_API_KEY, and LIVEKIT_API_SECRET in your .env.local or environment.")
     # Exit the process to avoid silent failures
     import sys; sys.exit(1)
-def _load_log():
-    """Load the wellness log JSON file, returning a list of entries."""
-    if not os.path.exists(WELLNESS_LOG_PATH):
-        return []
-    try:
-        with open(WELLNESS_LOG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to load wellness log: {e}")
-        return []
 
 
-def _save_log(entries):
-    """Write the list of entries back to the JSON file with pretty formatting."""
-    try:
-        with open(WELLNESS_LOG_PATH, "w", encoding="utf-8") as f:
-            json.dump(entries, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        logger.error(f"Failed to save wellness log: {e}")
-
-
-class WellnessAssistant(Agent):
-    def __init__(self) -> None:
-        super().__init__(
-            instructions="""
+WELLNESS_INSTRUCTIONS = """
 You are a friendly, supportive health & wellness voice companion. Your job is to conduct a brief daily check‑in with the user.
 
 The flow you should follow (you can vary wording, but keep the structure):
@@ -80,12 +58,69 @@ The flow you should follow (you can vary wording, but keep the structure):
 
 **Never** give medical advice, diagnose, or make any health claims. Keep suggestions small, actionable, and non‑clinical (e.g., "consider a short walk", "break a big task into smaller steps").
 """
+
+
+def _migrate_legacy_log():
+    """Convert the legacy JSON array log to JSONL once, keeping the old file."""
+    if os.path.exists(WELLNESS_LOG_PATH) or not os.path.exists(LEGACY_WELLNESS_LOG_PATH):
+        return
+    try:
+        with open(LEGACY_WELLNESS_LOG_PATH, "rb") as f:
+            entries = orjson.loads(f.read())
+        with open(WELLNESS_LOG_PATH, "wb") as f:
+            f.writelines(orjson.dumps(entry) + b"\n" for entry in entries)
+    except Exception as e:
+        logger.error("Failed to migrate legacy wellness log: %s", e)
+
+
+def _load_last_entry():
+    """Return the most recent log entry, or None; only that line is parsed."""
+    _migrate_legacy_log()
+    if not os.path.exists(WELLNESS_LOG_PATH):
+        return None
+    try:
+        with open(WELLNESS_LOG_PATH, "rb") as f:
+            tail = deque((line for line in f if line.strip()), maxlen=1)
+        return orjson.loads(tail[0]) if tail else None
+    except Exception as e:
+        logger.error("Failed to load wellness log: %s", e)
+        return None
+
+
+def _append_entry(entry):
+    """Append a single entry to the JSONL file as one line."""
+    _migrate_legacy_log()
+    try:
+        with open(WELLNESS_LOG_PATH, "ab") as f:
+            f.write(orjson.dumps(entry) + b"\n")
+    except Exception as e:
+        logger.error("Failed to save wellness log: %s", e)
+
+
+def _utc_timestamp():
+    """Return the current UTC time as an ISO 8601 string with a trailing Z."""
+    ts = datetime.fromtimestamp(time.time_ns() / 1e9, tz=timezone.utc)
+    return ts.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _summarize_entry(entry):
+    """Format the spoken summary of a check-in, or "" when there is none."""
+    # Runs while the agent is constructed, so a malformed log line must not raise.
+    if not isinstance(entry, dict):
+        return ""
+    mood = str(entry.get("mood") or "")
+    energy = str(entry.get("energy") or "")
+    return f"Yesterday you felt {mood.lower()} with {energy.lower()} energy."
+
+
+class WellnessAssistant(Agent):
+    def __init__(self) -> None:
+        super().__init__(
+            instructions=WELLNESS_INSTRUCTIONS,
         )
-        # Load any existing log so we can reference the last entry.
-        self.last_entry = None
-        entries = _load_log()
-        if entries:
-            self.last_entry = entries[-1]
+        # Only the last entry is referenced, so skip parsing the rest of the log.
+        self.last_entry = _load_last_entry()
+        self._last_summary = _summarize_entry(self.last_entry)
 
     @function_tool
     async def add_checkin(
@@ -101,74 +136,36 @@ The flow you should follow (you can vary wording, but keep the structure):
         The function returns a short confirmation message.
         """
         entry = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
             "mood": mood,
             "energy": energy,
             "stress": stress,
             "objectives": [obj.strip() for obj in objectives.split(',') if obj.strip()],
         }
-        entries = _load_log()
-        entries.append(entry)
-        _save_log(entries)
+        await offload_write(_append_entry, entry)
         self.last_entry = entry
+        self._last_summary = _summarize_entry(entry)
         return "Check‑in saved successfully."
 
     @function_tool
     async def get_last_checkin(self, ctx: RunContext) -> str:
         """Return a brief summary of the previous day's check‑in, or an empty string if none exists."""
-        if not self.last_entry:
-            return ""
-        mood = self.last_entry.get("mood", "")
-        energy = self.last_entry.get("energy", "")
-        return f"Yesterday you felt {mood.lower()} with {energy.lower()} energy."
-
-
-def prewarm(proc: JobProcess):
-    # Load VAD model once for all workers
-    proc.userdata["vad"] = silero.VAD.load()
+        return self._last_summary
 
 
 async def entrypoint(ctx: JobContext):
     # Add room name to log context for easier debugging
     ctx.log_context_fields = {"room": ctx.room.name}
 
-    session = AgentSession(
-        stt=deepgram.STT(model="nova-3"),
-        llm=openai.LLM(
-            model="gpt-4o-mini",
-            temperature=0.7,
-        ),
-        tts=murf.TTS(
-            voice="en-US-matthew",
-            style="Conversation",
-            tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-            text_pacing=True,
-        ),
-        turn_detection=MultilingualModel(),
-        vad=ctx.proc.userdata["vad"],
-        preemptive_generation=True,
-    )
+    session = create_session(ctx.proc.userdata["vad"], "wellness-checkin")
 
     # Metrics collection (same as barista example)
-    usage_collector = metrics.UsageCollector()
-
-    @session.on("metrics_collected")
-    def _on_metrics_collected(ev: MetricsCollectedEvent):
-        metrics.log_metrics(ev.metrics)
-        usage_collector.collect(ev.metrics)
-
-    async def log_usage():
-        summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
-
-    ctx.add_shutdown_callback(log_usage)
+    attach_metrics(ctx, session, logger)
 
     await session.start(
         agent=WellnessAssistant(),
         room=ctx.room,
-        room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVC(),
-        ),
+        room_options=room_options(),
     )
 
     await ctx.connect()
@@ -179,4 +176,4 @@ if __name__ == "__main__":
     if dummy_vars:
         print("Running in development mode with dummy LiveKit configuration. Agent not started.")
     else:
-        cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+        run_app(entrypoint)
@@ -108,3 +108,20 @@ async def test_refuses_harmful_request() -> None:
 
         # Ensures there are no function calls or other unexpected events
         result.expect.no_more_events()
+
+
+@pytest.mark.asyncio
+async def test_records_order_with_field_tools() -> None:
+    """Evaluation of the agent's use of the per-field order tools."""
+    async with (
+        _llm() as llm,
+        AgentSession(llm=llm) as session,
+    ):
+        await session.start(Assistant())
+
+        # Run an agent turn where the user gives two order details at once
+        result = await session.run(user_input="Hi, can I get a large latte?")
+
+        # Each detail should be recorded through its own tool
+        result.expect.contains_function_call(name="set_drink")
+        result.expect.contains_function_call(name="set_size")
@@ -0,0 +1,71 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import orjson
+import pytest
+
+# Add the 'backend' directory to sys.path so we can import 'src'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agent import Assistant
+
+
+@pytest.fixture
+def assistant():
+    return Assistant()
+
+def _state(reply):
+    return orjson.loads(reply.split("Current state: ", 1)[1])
+
+@pytest.mark.asyncio
+async def test_set_drink_records_value(assistant: Assistant):
+    reply = await assistant.set_drink(MagicMock(), " Latte ")
+    assert assistant.order_state["drinkType"] == "Latte"
+    assert _state(reply) == assistant.order_state
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("blank", ["", "   "])
+async def test_blank_field_is_stored_as_missing(assistant: Assistant, blank):
+    await assistant.set_milk(MagicMock(), "Oat")
+    reply = await assistant.set_milk(MagicMock(), blank)
+    assert assistant.order_state["milk"] is None
+    assert _state(reply)["milk"] is None
+
+@pytest.mark.asyncio
+async def test_add_extras_appends_to_list(assistant: Assistant):
+    await assistant.add_extras(MagicMock(), "Vanilla Syrup, Extra Shot")
+    reply = await assistant.add_extras(MagicMock(), " , Whipped Cream,")
+    assert assistant.order_state["extras"] == ["Vanilla Syrup", "Extra Shot", "Whipped Cream"]
+    assert _state(reply)["extras"] == assistant.order_state["extras"]
+
+@pytest.mark.asyncio
+async def test_changed_field_refreshes_cached_state(assistant: Assistant):
+    before = assistant._order_json_cache
+    reply = await assistant.set_size(MagicMock(), "Large")
+    assert assistant._order_json_cache != before
+    assert orjson.loads(assistant._order_json_cache) == assistant.order_state
+    assert _state(reply)["size"] == "Large"
+
+@pytest.mark.asyncio
+async def test_repeated_value_keeps_cached_state(assistant: Assistant):
+    await assistant.set_name(MagicMock(), "Sam")
+    cached = assistant._order_json_cache
+    await assistant.set_name(MagicMock(), "Sam")
+    assert assistant._order_json_cache is cached
+
+@pytest.mark.asyncio
+async def test_duplicate_extra_keeps_cached_state(assistant: Assistant):
+    await assistant.add_extras(MagicMock(), "Extra Shot")
+    cached = assistant._order_json_cache
+    await assistant.add_extras(MagicMock(), "Extra Shot")
+    assert assistant._order_json_cache is cached
+    assert assistant._extras_set == set(assistant.order_state["extras"])
+    assert assistant.order_state["extras"] == ["Extra Shot"]
+
+@pytest.mark.asyncio
+async def test_add_extras_dedup_keeps_first_seen_order(assistant: Assistant):
+    await assistant.add_extras(MagicMock(), "Oat Foam, Extra Shot, Oat Foam")
+    await assistant.add_extras(MagicMock(), "Caramel, Extra Shot, Vanilla Syrup")
+    assert assistant.order_state["extras"] == ["Oat Foam", "Extra Shot", "Caramel", "Vanilla Syrup"]
+    assert assistant._extras_set == set(assistant.order_state["extras"])
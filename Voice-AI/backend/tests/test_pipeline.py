@@ -0,0 +1,106 @@
+import asyncio
+import sys
+from collections import deque
+from unittest.mock import MagicMock
+
+import livekit.plugins
+import pytest
+from livekit import rtc
+from livekit.agents import metrics
+
+# Same import root as the agents, so tests patch the module they actually run.
+import _pipeline as pipeline
+
+
+def test_drain_metrics_collects_in_order(monkeypatch):
+    monkeypatch.setattr(pipeline.metrics, "log_metrics", MagicMock())
+    collector = MagicMock()
+    buffer = deque(["stt", "llm", "tts"])
+    pipeline.drain_metrics(buffer, collector)
+    assert not buffer
+    assert [c.args[0] for c in collector.collect.call_args_list] == ["stt", "llm", "tts"]
+
+def test_drain_metrics_survives_a_failing_item(monkeypatch):
+    def log_metrics(agent_metrics):
+        if agent_metrics == "bad":
+            raise ValueError(agent_metrics)
+
+    monkeypatch.setattr(pipeline.metrics, "log_metrics", log_metrics)
+    collector = MagicMock()
+    buffer = deque(["stt", "bad", "tts"])
+    pipeline.drain_metrics(buffer, collector)
+    assert not buffer
+    assert [c.args[0] for c in collector.collect.call_args_list] == ["stt", "tts"]
+
+def _llm_metrics(tokens):
+    return metrics.LLMMetrics(
+        label="llm", request_id="r", timestamp=0.0, duration=0.1, ttft=0.05,
+        cancelled=False, completion_tokens=tokens, prompt_tokens=tokens,
+        prompt_cached_tokens=0, total_tokens=2 * tokens, tokens_per_second=1.0,
+    )
+
+@pytest.mark.asyncio
+async def test_stop_metrics_flush_drains_before_summary(monkeypatch):
+    # Interval far beyond the test so only the shutdown drain can collect.
+    monkeypatch.setattr(pipeline, "METRICS_FLUSH_INTERVAL", 60)
+    collector = metrics.UsageCollector()
+    buffer = deque()
+    flush_task = asyncio.create_task(pipeline.flush_metrics(buffer, collector))
+    buffer.extend([_llm_metrics(3), _llm_metrics(4)])
+    await pipeline.stop_metrics_flush(flush_task, buffer, collector)
+    assert flush_task.cancelled()
+    assert not buffer
+    assert collector.get_summary().llm_completion_tokens == 7
+
+@pytest.mark.parametrize(
+    ("value", "enabled"),
+    [("1", True), ("true", True), ("0", False), ("false", False), (" Off ", False), ("no", False)],
+)
+def test_nc_enabled_parses_common_false_values(value, enabled):
+    assert pipeline._nc_enabled(value) is enabled
+
+@pytest.mark.parametrize(
+    ("kind", "model"),
+    [
+        (rtc.ParticipantKind.PARTICIPANT_KIND_SIP, "BVCTelephony"),
+        (rtc.ParticipantKind.PARTICIPANT_KIND_STANDARD, "BVC"),
+    ],
+)
+def test_select_noise_cancellation_by_participant_kind(monkeypatch, kind, model):
+    noise_cancellation = MagicMock()
+    monkeypatch.setitem(sys.modules, "livekit.plugins.noise_cancellation", noise_cancellation)
+    monkeypatch.setattr(livekit.plugins, "noise_cancellation", noise_cancellation, raising=False)
+    params = MagicMock()
+    params.participant.kind = kind
+    assert pipeline.select_noise_cancellation(params) is getattr(noise_cancellation, model).return_value
+
+@pytest.mark.asyncio
+async def test_attach_metrics_logs_usage_at_shutdown(monkeypatch):
+    monkeypatch.setattr(pipeline.metrics, "log_metrics", MagicMock())
+    handlers, callbacks = {}, []
+    session = MagicMock()
+    session.on = lambda event: lambda fn: handlers.setdefault(event, fn)
+    ctx = MagicMock()
+    ctx.add_shutdown_callback = callbacks.append
+    logger = MagicMock()
+    pipeline.attach_metrics(ctx, session, logger)
+    handlers["metrics_collected"](MagicMock(metrics=_llm_metrics(5)))
+    await callbacks[0]()
+    summary = logger.info.call_args.args[1]
+    assert summary.llm_completion_tokens == 5
+
+def test_prewarm_reuses_vad_within_interpreter(monkeypatch):
+    # Plugins are imported lazily, so only the one prewarm touches needs mocking
+    silero = MagicMock()
+    monkeypatch.setitem(sys.modules, "livekit.plugins.silero", silero)
+    # `from livekit.plugins import silero` reads the package attribute first,
+    # which an earlier real import would have set.
+    monkeypatch.setattr(livekit.plugins, "silero", silero, raising=False)
+    monkeypatch.setattr(pipeline, "install_uvloop", lambda: None)
+    pipeline.load_vad.cache_clear()
+    first, second = MagicMock(userdata={}), MagicMock(userdata={})
+    pipeline.prewarm(first)
+    pipeline.prewarm(second)
+    assert first.userdata["vad"] is second.userdata["vad"]
+    silero.VAD.load.assert_called_once()
+    pipeline.load_vad.cache_clear()
@@ -1,32 +1,40 @@
 import os
 import sys
-import pytest
 from unittest.mock import MagicMock
 
-# Mock the plugins BEFORE importing the agent module
-# This prevents ImportError if the environment is missing specific plugins
-sys.modules["livekit.plugins.murf"] = MagicMock()
-sys.modules["livekit.plugins.silero"] = MagicMock()
-sys.modules["livekit.plugins.deepgram"] = MagicMock()
-sys.modules["livekit.plugins.noise_cancellation"] = MagicMock()
-sys.modules["livekit.plugins.openai"] = MagicMock()
-sys.modules["livekit.plugins.turn_detector"] = MagicMock()
-sys.modules["livekit.plugins.turn_detector.multilingual"] = MagicMock()
-
+import orjson
+import pytest
 from livekit.agents import RunContext
 
 # Add the 'backend' directory to sys.path so we can import 'src'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import the WellnessAssistant and helper functions
-from src.wellness_agent import WellnessAssistant, WELLNESS_LOG_PATH, _load_log, _save_log
+from src.wellness_agent import (
+    LEGACY_WELLNESS_LOG_PATH,
+    WELLNESS_LOG_PATH,
+    WellnessAssistant,
+)
+
+
+def _load_log():
+    """Test helper: read every entry back from the JSONL wellness log."""
+    if not os.path.exists(WELLNESS_LOG_PATH):
+        return []
+    with open(WELLNESS_LOG_PATH, "rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+def _remove_logs():
+    for path in (WELLNESS_LOG_PATH, LEGACY_WELLNESS_LOG_PATH):
+        if os.path.exists(path):
+            os.remove(path)
 
 @pytest.fixture
 def assistant():
     """Create a fresh WellnessAssistant with a clean log file."""
-    if os.path.exists(WELLNESS_LOG_PATH):
-        os.remove(WELLNESS_LOG_PATH)
-    return WellnessAssistant()
+    _remove_logs()
+    yield WellnessAssistant()
+    _remove_logs()
 
 @pytest.mark.asyncio
 async def test_add_checkin_persists(assistant: WellnessAssistant):
@@ -60,3 +68,27 @@ async def test_get_last_checkin_returns_summary(assistant: WellnessAssistant):
     summary = await assistant.get_last_checkin(ctx)
     assert "tired" in summary.lower()
     assert "low" in summary.lower()
+
+@pytest.mark.asyncio
+async def test_checkins_append_and_reload_last(assistant: WellnessAssistant):
+    ctx = MagicMock()
+    await assistant.add_checkin(ctx, mood="calm", energy="medium", stress="none", objectives="read")
+    await assistant.add_checkin(ctx, mood="sad", energy="low", stress="exams", objectives="study")
+    assert [entry["mood"] for entry in _load_log()] == ["calm", "sad"]
+    assert WellnessAssistant().last_entry["mood"] == "sad"
+
+@pytest.mark.asyncio
+async def test_legacy_json_log_is_migrated(assistant: WellnessAssistant):
+    with open(LEGACY_WELLNESS_LOG_PATH, "wb") as f:
+        f.write(orjson.dumps([{"mood": "Calm", "energy": "Medium"}, {"mood": "Tired", "energy": "Low"}]))
+    restored = WellnessAssistant()
+    assert restored.last_entry["mood"] == "Tired"
+    assert await restored.get_last_checkin(MagicMock()) == "Yesterday you felt tired with low energy."
+    await restored.add_checkin(MagicMock(), mood="ok", energy="high", stress="none", objectives="run")
+    assert [entry["mood"] for entry in _load_log()] == ["Calm", "Tired", "ok"]
+
+@pytest.mark.parametrize("line", [b'{"mood": null, "energy": "low"}', b'["not", "a", "dict"]', b"42"])
+def test_malformed_last_entry_does_not_break_startup(assistant: WellnessAssistant, line):
+    with open(WELLNESS_LOG_PATH, "wb") as f:
+        f.write(b'{"mood": "Calm", "energy": "Medium"}\n' + line + b"\n")
+    WellnessAssistant()